@@ -3,7 +3,7 @@
 import inspect
 from functools import partial, wraps
 
-import asyncer
+import anyio
 from typer import Typer
 
 # This is a async version of Typer
@@ -17,12 +17,12 @@ class AsyncTyper(Typer):
 
             @wraps(f)
             def runner(*args, **kwargs):
-                return asyncer.runnify(f)(*args, **kwargs)
+                return anyio.run(partial(f, *args, **kwargs))
 
             decorator(runner)
         else:
             decorator(f)
-        return f
+        return f  # keep the original coroutine function for in-process calls
 
     def callback(self, *args, **kwargs):
         decorator = super().callback(*args, **kwargs)
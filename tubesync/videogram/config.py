@@ -6,7 +6,7 @@ import json
 import os
 import sys
 from pathlib import Path
-from urllib.parse import urlparse
+from urllib.parse import urlsplit
 
 from loguru import logger
 
@@ -33,6 +33,10 @@ default_config = {
     "VIDEOGRAM_COOKIES_DIR": config_path.parent.joinpath("cookies").as_posix(),  # directory to store cookies
     # YouTube
     "VIDEOGRAM_YT_LANG": "en",  # prefered language
+    # yt-dlp
+    "VIDEOGRAM_YTDLP_CONCURRENCY": "8",  # max concurrent extractions of playlist entries
+    "VIDEOGRAM_YTDLP_CONCURRENT_FRAGMENTS": "4",  # number of fragments downloaded concurrently
+    "VIDEOGRAM_YTDLP_DOWNLOAD_CONCURRENCY": "3",  # max concurrent downloads of playlist entries
     # Telegram
     "VIDEOGRAM_TG_APPID": "",  # https://docs.pyrogram.org/start/setup
     "VIDEOGRAM_TG_APPHASH": "",
@@ -40,6 +44,7 @@ default_config = {
     "VIDEOGRAM_TG_SESSION_STRING": "",  # https://docs.pyrogram.org/topics/storage-engines
     "VIDEOGRAM_TG_TARGET_ID": "",  # Sync to which Telegram chat
     "VIDEOGRAM_TG_MAX_FILE_BYTES": "2097152000",  # Telegram max file size, default to 2000MB
+    "VIDEOGRAM_TG_UPLOAD_CONCURRENCY": "1",  # max concurrent uploads, messages are posted in playlist order only when 1
 }
 
 
@@ -82,7 +87,7 @@ def load_config() -> dict:
     if config.get("VIDEOGRAM_PROXY"):
         logger.debug(f"Found network proxy in config file: {config['VIDEOGRAM_PROXY']}")
         logger.debug(f"Use network proxy: {config['VIDEOGRAM_PROXY']}")
-        parsed_proxy = urlparse(config["VIDEOGRAM_PROXY"])
+        parsed_proxy = urlsplit(config["VIDEOGRAM_PROXY"])
         config["VIDEOGRAM_PROXY_SCHEME"] = str(parsed_proxy.scheme)
         config["VIDEOGRAM_PROXY_USER"] = str(parsed_proxy.username)
         config["VIDEOGRAM_PROXY_PASS"] = str(parsed_proxy.password)
@@ -95,7 +100,7 @@ def load_config() -> dict:
             if proxy in os.environ:
                 logger.debug(f"Found {proxy} in environment variables, use {os.environ[proxy]} as network proxy")
                 config["VIDEOGRAM_PROXY"] = os.environ[proxy]
-                parsed_proxy = urlparse(os.environ[proxy])
+                parsed_proxy = urlsplit(os.environ[proxy])
                 config["VIDEOGRAM_PROXY_SCHEME"] = str(parsed_proxy.scheme)
                 config["VIDEOGRAM_PROXY_USER"] = str(parsed_proxy.username)
                 config["VIDEOGRAM_PROXY_PASS"] = str(parsed_proxy.password)
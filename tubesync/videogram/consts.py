@@ -1,8 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-AUDIO_FORMATS = {".aac", ".ape", ".flac", ".m4a", ".mp3", ".ogg", ".opus", ".wav", ".wma"}
+AUDIO_FORMATS = frozenset({".aac", ".ape", ".flac", ".m4a", ".mp3", ".ogg", ".opus", ".wav", ".wma"})
+AUDIO_EXTS = frozenset(x.removeprefix(".") for x in AUDIO_FORMATS)  # without leading dot, as "ext" in yt-dlp info
 DOMAINS = {
-    "bilibili": {"www.bilibili.com", "m.bilibili.com", "b23.tv"},
-    "youtube": {"www.youtube.com", "m.youtube.com", "youtu.be"},
+    "bilibili": frozenset({"www.bilibili.com", "m.bilibili.com", "b23.tv"}),
+    "youtube": frozenset({"www.youtube.com", "m.youtube.com", "youtu.be"}),
 }
+DOMAIN_TO_PROVIDER = {domain: provider for provider, domains in DOMAINS.items() for domain in domains}
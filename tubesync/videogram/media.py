@@ -2,16 +2,29 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-import json
+import os
+from functools import lru_cache
 from pathlib import Path
 
+import av
 import requests
 from ffmpeg import FFmpeg, FFmpegError
 from loguru import logger
 
 from videogram.config import config, config_path, save_config
 from videogram.consts import AUDIO_FORMATS
-from videogram.utils import check_required_keys
+
+
+@lru_cache(maxsize=32)
+def scan_dir(directory: str, mtime_ns: int) -> frozenset[str]:  # noqa: ARG001
+    """List file names in `directory`, `mtime_ns` is only used as part of the cache key."""
+    return frozenset(entry.name for entry in os.scandir(directory))
+
+
+def list_siblings(path: Path) -> frozenset[str]:
+    """List file names in the directory of `path` with one scandir, cached until the directory is modified."""
+    parent = path.parent
+    return scan_dir(parent.as_posix(), parent.stat().st_mtime_ns)
 
 
 def generate_cover(path: str) -> str:
@@ -27,44 +40,28 @@ def generate_cover(path: str) -> str:
     """
     logger.debug(f"Generate cover for: {path}")
     jpg_path = Path(path).with_suffix(".jpg")
-    if jpg_path.exists():
+    siblings = list_siblings(jpg_path)
+    if jpg_path.name in siblings:
         logger.debug(f"JPG cover image already exists: {jpg_path.as_posix()}")
         return jpg_path.as_posix()
 
-    webp_path = Path(path).with_suffix(".webp")
-    if webp_path.exists():
-        logger.debug(f"Found WebP cover image: {webp_path.as_posix()}, convert to JPG ...")
-        try:
-            ffmpeg = FFmpeg().option("y").option("loglevel", "warning").input(webp_path).output(jpg_path)
-            ffmpeg.execute()
-            return jpg_path.as_posix()
-        except FFmpegError as exception:
-            logger.error(f"Failed to convert WebP cover image to JPG: {webp_path.as_posix()}")
-            logger.error(f"Message from ffmpeg: {exception.message}")
-            logger.warning("Trying next method to gernerate JPG cover image ...")
-
-    png_path = Path(path).with_suffix(".png")
-    if png_path.exists():
-        logger.debug(f"Found PNG cover image: {png_path.as_posix()}, convert to JPG ...")
-        try:
-            ffmpeg = FFmpeg().option("y").option("loglevel", "warning").input(png_path).output(jpg_path)
-            ffmpeg.execute()
-            return jpg_path.as_posix()
-        except FFmpegError as exception:
-            logger.error(f"Failed to convert PNG cover image to JPG: {png_path.as_posix()}")
-            logger.error(f"Message from ffmpeg: {exception.message}")
-            logger.warning("Trying next method to gernerate JPG cover image ...")
-
-    # For video format, generate cover image from the first frame
+    # Candidate sources in order of preference: downloaded WebP/PNG cover, then the first frame for video format.
+    # Only existing candidates are passed to ffmpeg, usually a single invocation.
+    candidates = [(Path(path).with_suffix(".webp"), {}), (Path(path).with_suffix(".png"), {})]
     if Path(path).suffix not in AUDIO_FORMATS:
-        logger.debug(f"No cover image found, generate from the first frame of {path}")
+        candidates.append((Path(path), {"vframes": 1}))
+    for source, options in candidates:
+        if source.name not in siblings:
+            continue
+        logger.debug(f"Generate JPG cover image from: {source.as_posix()}")
         try:
-            ffmpeg = FFmpeg().option("y").option("loglevel", "warning").input(path).output(jpg_path, vframes=1)
+            ffmpeg = FFmpeg().option("y").option("loglevel", "warning").input(source).output(jpg_path, **options)
             ffmpeg.execute()
             return jpg_path.as_posix()
         except FFmpegError as exception:
-            logger.error(f"Failed to convert first video frame to JPG: {png_path.as_posix()}")
+            logger.error(f"Failed to generate JPG cover image from: {source.as_posix()}")
             logger.error(f"Message from ffmpeg: {exception.message}")
+            logger.warning("Trying next method to gernerate JPG cover image ...")
 
     # For failing to generate from ffmpeg or audio format, use default cover image.
     # Download if not exists.
@@ -86,6 +83,32 @@ def generate_cover(path: str) -> str:
     return default_cover
 
 
+def probe_media(path: Path) -> dict:
+    """Probe duration of the first stream and size of the first video stream.
+
+    Use libav bindings (PyAV) instead of spawning a ffprobe process for every media file.
+
+    Args:
+        path (Path): media file path
+
+    Returns:
+        dict: {"duration": float, "width": int, "height": int}, width and height are 0 if no video stream.
+    """
+    with av.open(path.as_posix()) as container:
+        stream = container.streams[0]
+        if stream.duration is not None and stream.time_base is not None:
+            duration = float(stream.duration * stream.time_base)
+        elif container.duration is not None:
+            duration = container.duration / av.time_base
+        else:
+            msg = f"Duration not found for: {path.as_posix()}"
+            raise KeyError(msg)
+        if not container.streams.video:
+            return {"duration": duration, "width": 0, "height": 0}
+        codec = container.streams.video[0].codec_context
+        return {"duration": duration, "width": codec.width, "height": codec.height}
+
+
 def parse_general_info(path: Path, media_format: str, link: str = "") -> dict:
     """Given a media filepath, parse necessary information for uploading to Telegram.
 
@@ -100,23 +123,17 @@ def parse_general_info(path: Path, media_format: str, link: str = "") -> dict:
         height: int
         thumb: str
     """
-    ffprobe = FFmpeg(executable="ffprobe").input(
-        path.as_posix(),
-        print_format="json",  # ffprobe will output the results in JSON format
-        show_streams=None,  # show stream information
-    )
-    metadata = json.loads(ffprobe.execute())
-    check_required_keys(metadata, ["streams"])
-    check_required_keys(metadata["streams"][0], ["duration"])
+    metadata = probe_media(path)
     caption = f"[{path.stem}]({link})" if link else path.stem
-    duration = round(float(metadata["streams"][0]["duration"]))  # in seconds
-    width = next(x["width"] for x in metadata["streams"] if "width" in x) if media_format == "video" else 0
-    height = next(x["height"] for x in metadata["streams"] if "height" in x) if media_format == "video" else 0
+    duration = round(metadata["duration"])  # in seconds
+    width = metadata["width"] if media_format == "video" else 0
+    height = metadata["height"] if media_format == "video" else 0
     thumb = generate_cover(path.as_posix())
+    resolved_path = path.resolve().as_posix()
     return {
         "title": path.stem,
-        "video_path": path.resolve().as_posix(),
-        "audio_path": path.resolve().as_posix(),
+        "video_path": resolved_path,
+        "audio_path": resolved_path,
         "caption": caption,
         "uploader": "",
         "duration": duration,
@@ -145,13 +162,7 @@ def ffmpeg_split_by_size(file_path: Path, out_path: Path, split_size: int, start
         else:
             return {"valid": False}
 
-    ffprobe = FFmpeg(executable="ffprobe").input(
-        out_path.as_posix(),
-        print_format="json",  # ffprobe will output the results in JSON format
-        show_streams=None,  # show stream information
-    )
-    metadata = json.loads(ffprobe.execute())
-    duration = float(metadata["streams"][0]["duration"])
+    duration = probe_media(out_path)["duration"]
     return {"valid": True, "duration": duration}
 
 
@@ -171,15 +182,15 @@ def split_video_by_size(info: dict, split_size: str = config.get("VIDEOGRAM_TG_M
         list[dict]: list of video info
     """
     file_path = Path(info["video_path"])
-    cover_path = generate_cover(file_path.as_posix())
     file_size = file_path.stat().st_size
-    if file_size <= int(split_size):
+    max_size = int(split_size)
+    if file_size <= max_size:
         return [info]
 
-    reduced_split_size = int(split_size) - 50 * 1024 * 1024  # reduce split size a little bit (50MB)
-    logger.info(f"Video file size: {file_size/1024/1024:.1f} MB, split size: {int(reduced_split_size)/1024/1024:.1f} MB")
+    reduced_split_size = max_size - 50 * 1024 * 1024  # reduce split size a little bit (50MB)
+    logger.info(f"Video file size: {file_size/1024/1024:.1f} MB, split size: {reduced_split_size/1024/1024:.1f} MB")
     file_stem = file_path.stem
-    num_split_parts = (file_size // reduced_split_size) + 1
+    num_split_parts = (file_size // reduced_split_size) + 1  # the extra part covers container headers and keyframe overlap
     logger.info(f"Split video file: {file_path.name} into {num_split_parts} parts.")
     results = []
     start_time = 0
@@ -194,7 +205,7 @@ def split_video_by_size(info: dict, split_size: str = config.get("VIDEOGRAM_TG_M
                     "video_path": out_path.as_posix(),
                     "duration": round(splited_info["duration"]),
                     "caption": f"{info['caption']}-P{idx+1}",
-                    "thumb": cover_path,
+                    "thumb": info["thumb"],
                 }
             )
             results.append(new_info)
@@ -3,23 +3,30 @@
 from __future__ import annotations
 
 import json
+from contextlib import asynccontextmanager
+from functools import cache
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 from loguru import logger
-from pyrogram.client import Client
-from pyrogram.types import Message, ReplyParameters
 
 from videogram.config import config, config_path
 from videogram.utils import check_required_keys
 
+# pyrogram is imported lazily where needed, it is expensive to import and not every command uploads to Telegram.
 if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from pyrogram.client import Client
     from pyrogram.types import Message
 
 
+@cache
 def telegram_proxy() -> dict:
     """Set network proxy for Telegram client.
 
+    The proxy settings do not change during a run, so the result is computed once.
+
     https://docs.pyrogram.org/topics/proxy
     """
     if not config.get("VIDEOGRAM_PROXY", ""):
@@ -29,19 +36,26 @@ def telegram_proxy() -> dict:
         "hostname": config.get("VIDEOGRAM_PROXY_HOST"),
         "port": int(config.get("VIDEOGRAM_PROXY_PORT", 7890)),
     }
-    if config.get("VIDEOGRAM_PROXY_USER", ""):
-        proxy["username"] = config.get("VIDEOGRAM_PROXY_USER")
-    if config.get("VIDEOGRAM_PROXY_PASS", ""):
-        proxy["password"] = config.get("VIDEOGRAM_PROXY_PASS")
+    if username := config.get("VIDEOGRAM_PROXY_USER", ""):
+        proxy["username"] = username
+    if password := config.get("VIDEOGRAM_PROXY_PASS", ""):
+        proxy["password"] = password
     logger.trace(f"set Telegram proxy: {proxy}")
     return proxy
 
 
-async def init_telegram_bot() -> Client:
-    """Telegram Authorization.
+@asynccontextmanager
+async def init_telegram_bot() -> AsyncIterator[Client]:
+    """Telegram Authorization, yield a started client.
+
+    When authorized via bot token, the exported session string is saved for later runs,
+    and the same connected client is yielded instead of authorizing a second client.
 
     docs: https://docs.pyrogram.org/topics/storage-engines
     """
+    from pyrogram.client import Client  # noqa: PLC0415  # pyrogram is expensive to import, only load it when connecting
+
+    export_session = False
     if config.get("VIDEOGRAM_TG_SESSION_STRING", ""):
         logger.debug("Use VIDEOGRAM_TG_SESSION_STRING to authorize telegram bot.")
         app = Client(
@@ -54,7 +68,7 @@ async def init_telegram_bot() -> Client:
     elif config.get("VIDEOGRAM_TG_BOT_TOKEN", ""):
         check_required_keys(config, ["VIDEOGRAM_TG_APPID", "VIDEOGRAM_TG_APPHASH"])
         logger.debug("Use VIDEOGRAM_TG_BOT_TOKEN to authorize telegram bot.")
-        bot = Client(
+        app = Client(
             "youtube",
             api_id=config.get("VIDEOGRAM_TG_APPID", ""),
             api_hash=config.get("VIDEOGRAM_TG_APPHASH", ""),
@@ -63,63 +77,74 @@ async def init_telegram_bot() -> Client:
             no_updates=True,
             proxy=telegram_proxy(),
         )
-        async with bot:
-            session_string = await bot.export_session_string()
-            app = Client(
-                "youtube",
-                session_string=session_string,  # type: ignore
-                in_memory=True,
-                no_updates=True,
-                proxy=telegram_proxy(),
-            )
-        # save session_string to config
-        logger.info(f"Save VIDEOGRAM_TG_SESSION_STRING to {config_path.as_posix()}")
-        config["VIDEOGRAM_TG_SESSION_STRING"] = session_string
-        with config_path.open("w") as f:
-            json.dump(config, f, indent=2)
-
+        export_session = True
     else:
         msg = "No authorization method found."
         msg += "\nPlease set VIDEOGRAM_TG_SESSION_STRING (https://docs.pyrogram.org/start/auth)"
         msg += "\nor set VIDEOGRAM_TG_BOT_TOKEN & VIDEOGRAM_TG_APPID & VIDEOGRAM_TG_APPHASH"
         raise RuntimeError(msg)
-    return app
+
+    async with app:
+        if export_session:
+            # save session_string to config
+            session_string = await app.export_session_string()
+            logger.info(f"Save VIDEOGRAM_TG_SESSION_STRING to {config_path.as_posix()}")
+            config["VIDEOGRAM_TG_SESSION_STRING"] = session_string
+            with config_path.open("w") as f:
+                json.dump(config, f, indent=2)
+        yield app
 
 
 async def telegram_process(current, total):
     logger.trace(f"Uploading {current/1024/1024:.1f} / {total/1024/1024:.1f} MB ({current / total:.2%})")
 
 
-async def send_video_telegram(info: dict, target: str, reply_msg_id: str) -> Message | None:
+async def send_video_telegram(info: dict, target: str, reply_msg_id: str, *, client: Client | None = None) -> Message | None:
+    """Upload video to Telegram.
+
+    Pass an already started `client` to reuse one session for multiple uploads, otherwise a new one is created.
+    """
+    if client is None:
+        async with init_telegram_bot() as new_client:
+            return await send_video_telegram(info, target, reply_msg_id, client=new_client)
+
+    from pyrogram.types import ReplyParameters  # noqa: PLC0415
+
     logger.info(f"Uploading video to Telegram for: {Path(info['video_path']).name} ")
-    client = await init_telegram_bot()
-    async with client:
-        return await client.send_video(
-            int(target),
-            video=info["video_path"],
-            caption=info["caption"],
-            duration=info["duration"],
-            width=info["width"],
-            height=info["height"],
-            supports_streaming=True,
-            progress=telegram_process,
-            reply_parameters=ReplyParameters(message_id=int(reply_msg_id)) if reply_msg_id else None,  # type: ignore
-            thumb=info["thumb"],
-        )
+    return await client.send_video(
+        int(target),
+        video=info["video_path"],
+        caption=info["caption"],
+        duration=info["duration"],
+        width=info["width"],
+        height=info["height"],
+        supports_streaming=True,
+        progress=telegram_process,
+        reply_parameters=ReplyParameters(message_id=int(reply_msg_id)) if reply_msg_id else None,  # type: ignore
+        thumb=info["thumb"],
+    )
+
+
+async def send_audio_telegram(info: dict, target: str, reply_msg_id: str, *, client: Client | None = None) -> Message | None:
+    """Upload audio to Telegram.
+
+    Pass an already started `client` to reuse one session for multiple uploads, otherwise a new one is created.
+    """
+    if client is None:
+        async with init_telegram_bot() as new_client:
+            return await send_audio_telegram(info, target, reply_msg_id, client=new_client)
 
+    from pyrogram.types import ReplyParameters  # noqa: PLC0415
 
-async def send_audio_telegram(info: dict, target: str, reply_msg_id: str) -> Message | None:
     logger.info(f"Uploading audio to Telegram for: {Path(info['audio_path']).name} ")
-    client = await init_telegram_bot()
-    async with client:
-        return await client.send_audio(
-            int(target),
-            audio=info["audio_path"],
-            caption=info["caption"],
-            duration=info["duration"],
-            performer=info.get("uploader", ""),
-            title=info["title"],
-            reply_parameters=ReplyParameters(message_id=int(reply_msg_id)) if reply_msg_id else None,  # type: ignore
-            progress=telegram_process,
-            thumb=info["thumb"],
-        )
+    return await client.send_audio(
+        int(target),
+        audio=info["audio_path"],
+        caption=info["caption"],
+        duration=info["duration"],
+        performer=info.get("uploader", ""),
+        title=info["title"],
+        reply_parameters=ReplyParameters(message_id=int(reply_msg_id)) if reply_msg_id else None,  # type: ignore
+        progress=telegram_process,
+        thumb=info["thumb"],
+    )
@@ -3,22 +3,25 @@
 from __future__ import annotations
 
 import json
+import os
+import time
 from collections.abc import Generator
+from functools import lru_cache
 from pathlib import Path
-from urllib.parse import urlparse
+from urllib.parse import urlsplit
 
+import orjson
 from loguru import logger
 
 from videogram.config import config
-from videogram.consts import DOMAINS
+from videogram.consts import DOMAIN_TO_PROVIDER
 
 
 def load_json(path: str | Path, default: dict | None = None) -> dict:
     path = Path(path)
     if Path(path).exists():
         logger.debug(f"Loading json from {path.as_posix()}")
-        with path.open() as f:
-            return json.load(f)
+        return orjson.loads(path.read_bytes())
     logger.warning(f"{path} is not exist, return default")
     if default is None:
         return {}
@@ -26,22 +29,37 @@ def load_json(path: str | Path, default: dict | None = None) -> dict:
 
 
 def save_json(data: dict | list, path: str | Path, indent: int | None = 2) -> None:
+    """Save data as UTF-8 json, with orjson for 2-space indent or compact output, json for other indents."""
     path = Path(path)
     path.parent.mkdir(parents=True, exist_ok=True)
     logger.debug(f"Saving json to {path.as_posix()}")
-    with path.open("w") as f:
-        json.dump(data, f, indent=indent, ensure_ascii=False)
+    if indent in (2, None):
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent == 2 else None))
+    else:  # orjson only supports 2-space indent
+        path.write_text(json.dumps(data, indent=indent, ensure_ascii=False), encoding="utf-8")
 
 
+@lru_cache(maxsize=1024)
 def parse_domain(url: str) -> str:
     logger.debug(f"Parse domain: {url}")
-    parsed_url = urlparse(url)
+    parsed_url = urlsplit(url)
     logger.debug(f"Parsed url: {parsed_url}")
     if not parsed_url.hostname:
         raise ValueError(f"Invalid URL: {url}")
     return parsed_url.hostname
 
 
+def absolute_path(path: str) -> str:
+    """Return the absolute posix path.
+
+    Paths from yt-dlp are usually absolute already, normalize them without the syscalls of `Path.resolve()`.
+    Note that symlinks are not resolved on the fast path.
+    """
+    if os.path.isabs(path) and ".." not in Path(path).parts:
+        return Path(os.path.normpath(path)).as_posix()
+    return Path(path).resolve().as_posix()
+
+
 def delete_files(path: str | Path | list | Generator):
     if isinstance(path, str):
         Path(path).unlink(missing_ok=True)
@@ -67,15 +85,34 @@ def check_required_keys(data: dict, keys: list[str]) -> None:
 
 
 def get_cookie_file(url: str) -> str:
-    domain = parse_domain(url)
+    return get_domain_cookie_file(parse_domain(url))
+
+
+@lru_cache(maxsize=64)
+def get_domain_cookie_file(domain: str) -> str:
     cookie_dir = Path(config.get("VIDEOGRAM_COOKIES_DIR", Path.home().joinpath(".config/videogram/cookies")))
     cookie_dir.mkdir(exist_ok=True)
-    for provider, domains in DOMAINS.items():
-        if domain in domains:
-            cookie_file = cookie_dir.joinpath(f"{provider}.txt").as_posix()
-            logger.debug(f"Cookie file: {cookie_file}")
-            return cookie_file
-
-    cookie_file = cookie_dir.joinpath(f"{domain}.txt").as_posix()
+    provider = DOMAIN_TO_PROVIDER.get(domain, domain)
+    cookie_file = cookie_dir.joinpath(f"{provider}.txt").as_posix()
     logger.debug(f"Cookie file: {cookie_file}")
     return cookie_file
+
+
+COOKIE_EXISTS_TTL = 60  # seconds
+cookie_exists_cache: dict[str, tuple[bool, float]] = {}  # cookie file -> (exists, expire time)
+
+
+def resolve_cookie_file(url: str, *, use_cookie: bool = True) -> str | None:
+    """Return the cookie file for the url if cookies are enabled and the file exists.
+
+    The existence check is cached for COOKIE_EXISTS_TTL seconds, to avoid a stat for every playlist entry.
+    """
+    if not use_cookie:
+        return None
+    cookie_file = get_cookie_file(url)
+    now = time.monotonic()
+    exists, expire = cookie_exists_cache.get(cookie_file, (False, 0.0))
+    if expire <= now:
+        exists = Path(cookie_file).exists()
+        cookie_exists_cache[cookie_file] = (exists, now + COOKIE_EXISTS_TTL)
+    return cookie_file if exists else None
@@ -1,5 +1,6 @@
 #! /usr/bin/env python
 # -*- coding: utf-8 -*-
+import asyncio
 from pathlib import Path
 from typing import Annotated
 
@@ -8,14 +9,19 @@ from loguru import logger
 
 from videogram.asynctyper import AsyncTyper
 from videogram.config import config, config_path, default_config, save_config
-from videogram.consts import AUDIO_FORMATS, DOMAINS
+from videogram.consts import AUDIO_FORMATS, DOMAIN_TO_PROVIDER
 from videogram.media import parse_general_info, split_video_by_size
-from videogram.telegram import send_audio_telegram, send_video_telegram
+from videogram.telegram import init_telegram_bot, send_audio_telegram, send_video_telegram
 from videogram.utils import delete_files, parse_domain
-from videogram.ytdlp import ytdlp_download, ytdlp_struct_info
 
 app = AsyncTyper()
 
+# supported providers and their display names, all downloaded via yt-dlp
+PROVIDERS = {
+    "bilibili": "Bilibili",
+    "youtube": "YouTube",
+}
+
 
 @app.command()
 def download(
@@ -27,9 +33,12 @@ def download(
     playlist: Annotated[bool, typer.Option(help="Whether to parse playlist.", show_default=True)] = True,
     use_cookie: Annotated[bool, typer.Option(help="Whether to use cookie file.", show_default=True)] = True,
 ) -> dict:
+    from videogram.ytdlp import ytdlp_download, ytdlp_struct_info  # noqa: PLC0415  # yt-dlp is expensive to import, only load it when downloading
+
     results = {
         "args": {
             "url": url,
+            "save_dir": save_dir,
             "download_video": download_video,
             "split_video": split_video,
             "playlist": playlist,
@@ -41,24 +50,21 @@ def download(
     logger.info(f"Download: {url}")
     domain = parse_domain(url)
 
-    # YouTube
-    if domain in DOMAINS["youtube"]:
-        logger.info("Downloading from YouTube ...")
-        download_info = ytdlp_download(url, Path(save_dir), use_cookie=use_cookie, playlist=playlist, download_video=download_video)
-    # Bilibili
-    elif domain in DOMAINS["bilibili"]:
-        logger.info("Downloading from Bilibili ...")
-        download_info = ytdlp_download(url, Path(save_dir), use_cookie=use_cookie, playlist=playlist, download_video=download_video)
-    else:
+    provider = DOMAIN_TO_PROVIDER.get(domain)
+    if provider not in PROVIDERS:
         logger.error(f"Unsupported domain: {domain}")
         raise typer.Exit(code=1)
 
-    info_list = [ytdlp_struct_info(info) for info in download_info]
-    results["audio_info"].extend(info_list)
-    if download_video and split_video:
-        [results["video_info"].extend(split_video_by_size(info)) for info in info_list]
-    elif download_video:
-        results["video_info"].extend(info_list)
+    logger.info(f"Downloading from {PROVIDERS[provider]} ...")
+    download_info = ytdlp_download(url, Path(save_dir), use_cookie=use_cookie, playlist=playlist, download_video=download_video)
+
+    for info in download_info:
+        struct_info = ytdlp_struct_info(info)
+        results["audio_info"].append(struct_info)
+        if download_video and split_video:
+            results["video_info"].extend(split_video_by_size(struct_info))
+        elif download_video:
+            results["video_info"].append(struct_info)
     return results
 
 
@@ -112,24 +118,38 @@ async def sync(
 
     # Upload to Telegram
     logger.info(f"Uploading to Telegram ChatID: {tg_id}")
-    if sync_video:
-        # Generate a list of files to upload, split large video files if needed.
-        for idx, video_info in enumerate(download_results["video_info"]):
-            logger.info(f"Uploading video {idx+1}/{len(download_results['video_info'])}")
-            msg = await send_video_telegram(video_info, tg_id, reply_msg_id)
-            results["video_messages"].append(msg)
-    if sync_audio:
-        for idx, audio_info in enumerate(download_results["audio_info"]):
-            logger.info(f"Uploading video {idx+1}/{len(download_results['audio_info'])}")
-            msg = await send_audio_telegram(audio_info, tg_id, reply_msg_id)
-            results["audio_messages"].append(msg)
+    # Upload on one session. Sequential by default: each send posts its message once the upload finishes,
+    # so concurrent uploads would post split parts out of order. Opt-in concurrency is bounded for Telegram flood limits.
+    semaphore = asyncio.Semaphore(int(config.get("VIDEOGRAM_TG_UPLOAD_CONCURRENCY", "1")))
+    async with init_telegram_bot() as client:
+
+        async def upload_one(send, info: dict, media_format: str, idx: int, total: int):
+            async with semaphore:
+                logger.info(f"Uploading {media_format} {idx+1}/{total}")
+                return await send(info, tg_id, reply_msg_id, client=client)
+
+        async def upload_all(send, infos: list[dict], media_format: str) -> list:
+            # TaskGroup cancels the pending uploads on the first failure, before the client is stopped.
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    tasks = [tg.create_task(upload_one(send, info, media_format, idx, len(infos))) for idx, info in enumerate(infos)]
+            except ExceptionGroup as eg:
+                raise eg.exceptions[0] from None  # surface the upload error, not the group
+            return [task.result() for task in tasks]  # keep the input order
+
+        if sync_video:
+            # Generate a list of files to upload, split large video files if needed.
+            results["video_messages"] = await upload_all(send_video_telegram, download_results["video_info"], "video")
+        if sync_audio:
+            results["audio_messages"] = await upload_all(send_audio_telegram, download_results["audio_info"], "audio")
 
     # Cleanup downloaded files
     if clean:
         logger.info("Clean up downloaded files.")
-        thumb_path = video_info["thumb"] if sync_video else audio_info["thumb"]
+        thumb_path = download_results["video_info"][-1]["thumb"] if sync_video else download_results["audio_info"][-1]["thumb"]
         prefix = Path(thumb_path).stem
-        trash_files = [p for p in Path(".").glob("**/*") if p.stem.startswith(prefix)]
+        # all downloaded files are in the save directory, no need to walk the whole tree
+        trash_files = [p for p in Path(download_results["args"]["save_dir"]).iterdir() if p.name.startswith(prefix)]
         delete_files(trash_files)
     return results
 
@@ -2,6 +2,12 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
 from pathlib import Path
 
 from loguru import logger
@@ -9,9 +15,112 @@ from yt_dlp import YoutubeDL
 from yt_dlp.utils import DownloadError, ExtractorError, YoutubeDLError
 
 from videogram.config import config
-from videogram.consts import AUDIO_FORMATS
+from videogram.consts import AUDIO_EXTS, AUDIO_FORMATS
 from videogram.media import generate_cover
-from videogram.utils import check_required_keys, get_cookie_file
+from videogram.utils import absolute_path, check_required_keys, resolve_cookie_file
+
+UPLOADER_TRANS = str.maketrans(dict.fromkeys(" .-/", "_"))  # compact uploader name to a hashtag
+EXTRACT_CACHE_SIZE = 512
+EXTRACT_CACHE_TTL = 600  # seconds, extracted info may expire (e.g. signed format URLs)
+extract_cache: OrderedDict[tuple[str, bool, bool], tuple[float, dict]] = OrderedDict()  # (url, use_cookie, process) -> (expire_time, info)
+extract_cache_lock = threading.Lock()
+
+# yt-dlp options shared by all calls, the config is loaded once at import.
+# YoutubeDL modifies its params in place, always copy them with a per-call overlay: {**BASE_OPTS, ...}
+BASE_OPTS = {
+    "proxy": config.get("VIDEOGRAM_YTDLP_PROXY"),
+    "extractor_args": {"youtube": {"lang": [config.get("VIDEOGRAM_YT_LANG", "en")]}},
+    "retries": 50,
+    "nocheckcertificate": True,
+    "source_address": "0.0.0.0",  # force-ipv4
+}
+EXTRACT_OPTS_BASE = {
+    **BASE_OPTS,
+    "simulate": True,
+    "skip_download": True,
+    "ignore_no_formats_error": True,
+}
+DOWNLOAD_OPTS_BASE = {
+    **BASE_OPTS,
+    "simulate": False,
+    "skip_download": False,
+    "keepvideo": True,
+    "writethumbnail": True,
+    "trim_file_name": 60,  # filesystem limit for filename is 255 bytes. UFT-8 char is 1-4 bytes.
+    "ignore_no_formats_error": False,
+    "live_from_start": True,
+    "concurrent_fragment_downloads": int(config.get("VIDEOGRAM_YTDLP_CONCURRENT_FRAGMENTS", "4")),  # for DASH/HLS formats
+    "http_chunk_size": 10 * 1024 * 1024,  # 10MB
+    "outtmpl": "%(title)s.%(ext)s",
+}
+
+
+def build_extract_ydl(url: str, *, use_cookie: bool = True, flat_playlist: bool = False) -> YoutubeDL:
+    """Build a YoutubeDL instance for extracting info of the given URL, without downloading.
+
+    With `flat_playlist`, playlist entries are not resolved (like `--flat-playlist`), they are extracted one by one later.
+    """
+    ydl_opts = {
+        **EXTRACT_OPTS_BASE,
+        "extract_flat": "in_playlist" if flat_playlist else False,
+        "cookiefile": resolve_cookie_file(url, use_cookie=use_cookie),
+    }
+    return YoutubeDL(ydl_opts)
+
+
+def extract_with(ydl: YoutubeDL, url: str, *, process: bool = False) -> dict:
+    """Extract info of the given URL with an existing YoutubeDL instance."""
+    try:
+        info: dict = ydl.extract_info(url, download=False, process=process)  # type: ignore
+    except ExtractorError as e:
+        logger.error(f"ExtractorError url: {url}")
+        logger.error(f"ExtractorError message: {e.msg}")
+        raise
+    except DownloadError as e:
+        logger.error(f"DownloadError url: {url}")
+        logger.error(f"DownloadError message: {e.msg}")
+        raise
+    except YoutubeDLError as e:
+        logger.error(f"YoutubeDLError url: {url}")
+        logger.error(f"YoutubeDLError message: {e.msg}")
+        raise
+    except Exception as e:
+        logger.error(e)
+        raise
+    logger.info(f"Extracted info for: {info.get('title', url)}")
+    return info
+
+
+def extract_info_single(url: str, *, use_cookie: bool = True, process: bool = False, ydl: YoutubeDL | None = None) -> dict:
+    """Extract info of a single (non-playlist) URL, memoized in process for `EXTRACT_CACHE_TTL` seconds.
+
+    Only video results are cached, playlist results carry one-shot `entries` generators when not processed.
+    A cache hit returns a shallow copy: top-level keys can be set freely, nested values are shared and must not be modified.
+    """
+    key = (url, use_cookie, process)
+    with extract_cache_lock:
+        cached = extract_cache.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                extract_cache.move_to_end(key)
+                logger.debug("Use cached info for: {}", url)
+                return cached[1].copy()
+            del extract_cache[key]
+
+    if ydl is None:
+        with build_extract_ydl(url, use_cookie=use_cookie) as new_ydl:
+            info = extract_with(new_ydl, url, process=process)
+    else:
+        info = extract_with(ydl, url, process=process)
+
+    if info.get("_type", "video") != "video" or "entries" in info:
+        return info
+    with extract_cache_lock:
+        extract_cache[key] = (time.monotonic() + EXTRACT_CACHE_TTL, info)
+        extract_cache.move_to_end(key)
+        while len(extract_cache) > EXTRACT_CACHE_SIZE:
+            extract_cache.popitem(last=False)
+    return info.copy()
 
 
 def ytdlp_extract_info(
@@ -32,75 +141,67 @@ def ytdlp_extract_info(
     Returns:
         list[dict]: List of extracted info.
     """
-    cookie_file = get_cookie_file(url)
-    ydl_opts = {
-        "simulate": True,
-        "skip_download": True,
-        "proxy": config.get("VIDEOGRAM_YTDLP_PROXY"),
-        "extractor_args": {"youtube": {"lang": [config.get("VIDEOGRAM_YT_LANG", "en")]}},
-        "ignore_no_formats_error": True,
-        "retries": 50,
-        "nocheckcertificate": True,
-        "source_address": "0.0.0.0",  # force-ipv4
-        "cookiefile": cookie_file if use_cookie and Path(cookie_file).exists() else None,
-    }
-    try:
-        with YoutubeDL(ydl_opts) as ydl:
-            info: dict = ydl.extract_info(url, download=False, process=process)  # type: ignore
-    except ExtractorError as e:
-        logger.error(f"ExtractorError url: {url}")
-        logger.error(f"ExtractorError message: {e.msg}")
-        raise
-    except DownloadError as e:
-        logger.error(f"DownloadError url: {url}")
-        logger.error(f"DownloadError message: {e.msg}")
-        raise
-    except YoutubeDLError as e:
-        logger.error(f"YoutubeDLError url: {url}")
-        logger.error(f"YoutubeDLError message: {e.msg}")
-        raise
-    except Exception as e:
-        logger.error(e)
-        raise
+    if not playlist:
+        return [extract_info_single(url, use_cookie=use_cookie, process=process)]
+
+    # entries are extracted concurrently below, no need to resolve them during the playlist enumeration
+    with build_extract_ydl(url, use_cookie=use_cookie, flat_playlist=True) as ydl:
+        info = extract_with(ydl, url, process=process)
 
-    if not playlist or info.get("_type") != "playlist":
-        logger.info(f"Extracted info for: {info.get('title', url)}")
+    if info.get("_type") != "playlist":
         return [info]
 
     # if playlist, extract all entries
-    entries = []
-    for x in info["entries"]:
-        entries.extend(list(x["entries"]))
+    entries = list(chain.from_iterable(x["entries"] for x in info["entries"]))
     logger.info(f"Found {len(entries)} entries in playlist")
-    return [ytdlp_extract_info(x["url"], playlist=False, process=process)[0] for x in entries]
 
+    # Extract entries concurrently, the work is network bound; map() keeps the playlist order.
+    # YoutubeDL is not thread-safe, so each worker thread reuses its own instance to keep connections alive between entries.
+    local = threading.local()
+    ydls: list[YoutubeDL] = []
 
-def ytdlp_download(url: str, save_dir: Path, *, use_cookie: bool = True, playlist: bool = True, download_video: bool = True) -> list[dict]:
-    cookie_file = get_cookie_file(url)
+    def extract_entry(entry_url: str) -> dict:
+        if not hasattr(local, "ydl"):
+            local.ydl = build_extract_ydl(url, use_cookie=use_cookie)
+            ydls.append(local.ydl)
+        return extract_info_single(entry_url, use_cookie=use_cookie, process=process, ydl=local.ydl)
+
+    try:
+        with ThreadPoolExecutor(max_workers=int(config.get("VIDEOGRAM_YTDLP_CONCURRENCY", "8"))) as pool:
+            return list(pool.map(extract_entry, [x["url"] for x in entries]))
+    finally:
+        for ydl in ydls:
+            ydl.close()
+
+
+def ytdlp_download(  # noqa: PLR0913
+    url: str,
+    save_dir: Path,
+    *,
+    use_cookie: bool = True,
+    playlist: bool = True,
+    download_video: bool = True,
+    outtmpl: str | None = None,
+) -> list[dict]:
+    save_dir_path = save_dir.resolve().as_posix()
     ydl_opts = {
-        "paths": {"home": save_dir.resolve().as_posix()},
-        "simulate": False,
-        "skip_download": False,
-        "keepvideo": True,
+        **DOWNLOAD_OPTS_BASE,
+        "paths": {"home": save_dir_path},
         "format": "m4a/bestaudio/best" if not download_video else video_selector,
-        "writethumbnail": True,
-        "trim_file_name": 60,  # filesystem limit for filename is 255 bytes. UFT-8 char is 1-4 bytes.
-        "proxy": config.get("VIDEOGRAM_YTDLP_PROXY"),
-        "extractor_args": {"youtube": {"lang": [config.get("VIDEOGRAM_YT_LANG", "en")]}},
-        "ignore_no_formats_error": False,
-        "live_from_start": True,
-        "retries": 50,
-        "nocheckcertificate": True,
-        "source_address": "0.0.0.0",  # force-ipv4
-        "outtmpl": "%(title)s.%(ext)s",
-        "cookiefile": cookie_file if use_cookie and Path(cookie_file).exists() else None,
+        "cookiefile": resolve_cookie_file(url, use_cookie=use_cookie),
         "noplaylist": not playlist,
     }
-    logger.debug(f"Downloading {url} to {save_dir.resolve().as_posix()}")
+    if outtmpl:
+        ydl_opts["outtmpl"] = outtmpl
+    logger.debug(f"Downloading {url} to {save_dir_path}")
     save_dir.mkdir(exist_ok=True)
     try:
         with YoutubeDL(ydl_opts) as ydl:
-            info: dict = ydl.extract_info(url, download=True, process=True)  # type: ignore
+            # extract without processing first, so playlist entries can be downloaded concurrently
+            info: dict = ydl.extract_info(url, download=False, process=False)  # type: ignore
+            download_entries = playlist and info.get("_type") == "playlist"
+            if not download_entries:
+                info = ydl.process_ie_result(info, download=True)
     except YoutubeDLError as e:
         logger.error(f"Failed to download for: {url}")
         logger.error(f"Error message: {e.msg}")
@@ -109,37 +210,86 @@ def ytdlp_download(url: str, save_dir: Path, *, use_cookie: bool = True, playlis
         logger.error(e)
         raise
 
-    if not playlist or info.get("_type") != "playlist":
+    if download_entries:
+        return ytdlp_download_entries(info, save_dir, use_cookie=use_cookie, download_video=download_video)
+
+    if info.get("_type") != "playlist":
         logger.info(f"Downloaded to: {info['requested_downloads'][0]['filepath']}")
         return [info]
 
-    # if playlist, return all entries
+    # already downloaded as a playlist by yt-dlp (e.g. a redirect to a playlist), return all entries
     for entry in info["entries"]:
         logger.info(f"Downloaded to: {entry['requested_downloads'][0]['filepath']}")
     return info["entries"]
 
 
+def ytdlp_download_entries(info: dict, save_dir: Path, *, use_cookie: bool = True, download_video: bool = True) -> list[dict]:
+    """Download entries of an unprocessed playlist info concurrently, keep the playlist order.
+
+    Failed entries are logged and skipped, without cancelling the others.
+    Output filenames are prefixed with the playlist index, so entries downloaded at the same time never write the same file,
+    even if their titles are the same after `trim_file_name` (e.g. long BiliBili multi-part titles, or duplicated entries).
+    """
+    urls = [entry.get("webpage_url") or entry["url"] for entry in info["entries"]]
+    logger.info(f"Downloading {len(urls)} entries of playlist: {info.get('title', info.get('id'))}")
+    results: list[list[dict]] = [[] for _ in urls]
+    with ThreadPoolExecutor(max_workers=int(config.get("VIDEOGRAM_YTDLP_DOWNLOAD_CONCURRENCY", "3"))) as pool:
+        futures = {
+            pool.submit(
+                ytdlp_download,
+                entry_url,
+                save_dir,
+                use_cookie=use_cookie,
+                playlist=False,
+                download_video=download_video,
+                outtmpl=f"{idx + 1:02} {DOWNLOAD_OPTS_BASE['outtmpl']}",  # trim_file_name cuts the tail, the index is kept
+            ): idx
+            for idx, entry_url in enumerate(urls)
+        }
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                results[idx] = future.result()
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"Skip failed playlist entry: {urls[idx]} ({e})")
+    downloads = [x for entry_results in results for x in entry_results]
+    if not downloads:
+        raise YoutubeDLError("Failed to download any entry of the playlist.")
+    return downloads
+
+
 def video_selector(ctx):
     """Select the best format.
 
     For the best compatibility, we choose .mp4 extension with AVC codec for video, .m4a extension for audio.
     """
-    # formats are already sorted worst to best
-    formats = ctx.get("formats")[::-1]
+    formats = ctx.get("formats") or []
     if not formats:
         raise YoutubeDLError("No format found.")
 
-    logger.trace(f"Choose best format from {len(formats)} extracted formats")
+    logger.opt(lazy=True).trace("Choose best format from {} extracted formats", lambda: len(formats))
     # acodec='none' means there is no audio
     # find compatible extension, VP9 is not supported by iOS, use AVC instead
-    all_videos = [f for f in formats if f.get("video_ext", "").lower() != "none"]
-    all_audios = [f for f in formats if f.get("audio_ext", "").lower() != "none"]
-    videos = [f for f in all_videos if f.get("video_ext", "").lower() == "mp4" and f.get("acodec", "").lower() == "none" and f.get("vcodec", "").lower().startswith("avc")]
-    audios = [f for f in all_audios if (f.get("resolution", "").lower() == "audio only" and f.get("audio_ext", "").lower() == "m4a")]
-    logger.trace(f"Found {len(videos)} video formats")
-    logger.trace(f"Found {len(audios)} video formats")
+    # classify all formats in a single pass, index them by format_id to look up the preferred ones
+    videos = []
+    audios = []
+    videos_by_id = {}
+    audios_by_id = {}
+    for f in reversed(formats):  # formats are already sorted worst to best
+        format_id = f.get("format_id", "")
+        video_ext = (f.get("video_ext") or "").lower()
+        audio_ext = (f.get("audio_ext") or "").lower()
+        if video_ext == "mp4" and (f.get("acodec") or "").lower() == "none" and (f.get("vcodec") or "").lower().startswith("avc"):
+            videos.append(f)
+            videos_by_id.setdefault(format_id, f)  # keep the best one if format_id is duplicated
+        if audio_ext == "m4a" and (f.get("resolution") or "").lower() == "audio only":
+            audios.append(f)
+            audios_by_id.setdefault(format_id, f)
+    logger.opt(lazy=True).trace("Found {} video formats", lambda: len(videos))
+    logger.opt(lazy=True).trace("Found {} audio formats", lambda: len(audios))
 
     # # if no compatible format found, fallback to the best format
+    # # (any format whose video_ext / audio_ext is not "none")
     # if not videos:
     #     videos = all_videos
     # if not audios:
@@ -149,7 +299,7 @@ def video_selector(ctx):
         raise YoutubeDLError("No video and audio format found.")
     elif not videos:
         best_audio = audios[0]
-        logger.debug(f"Use audio format: {best_audio['format']}")
+        logger.debug("Use audio format: {}", best_audio["format"])
         yield {
             "format_id": f"{best_audio['format_id']}",
             "ext": best_audio["ext"],
@@ -158,7 +308,7 @@ def video_selector(ctx):
         }
     elif not audios:
         best_video = videos[0]
-        logger.debug(f"Use video format: {best_video['format']}")
+        logger.debug("Use video format: {}", best_video["format"])
         yield {
             "format_id": f"{best_video['format_id']}",
             "ext": best_video["ext"],
@@ -166,10 +316,10 @@ def video_selector(ctx):
             "protocol": f"{best_video['protocol']}",
         }
     else:
-        best_video = next((x for x in videos if x.get("format_id", "") == "299"), videos[0])  # prefer 299
-        best_audio = next((x for x in audios if x.get("format_id", "") == "140"), audios[0])  # prefer 140
-        logger.debug(f"Use video format: {best_video['format']}")
-        logger.debug(f"Use audio format: {best_audio['format']}")
+        best_video = videos_by_id.get("299") or videos[0]  # prefer 299
+        best_audio = audios_by_id.get("140") or audios[0]  # prefer 140
+        logger.debug("Use video format: {}", best_video["format"])
+        logger.debug("Use audio format: {}", best_audio["format"])
         yield {
             "format_id": f"{best_video['format_id']}+{best_audio['format_id']}",
             "ext": best_video["ext"],
@@ -198,8 +348,9 @@ def ytdlp_struct_info(info: dict) -> dict:
 
     if video_path:
         thumb = generate_cover(video_path)
-        width = next(x["width"] for x in info["requested_downloads"][0]["requested_formats"] if f".{x['ext']}" not in AUDIO_FORMATS)
-        height = next(x["height"] for x in info["requested_downloads"][0]["requested_formats"] if f".{x['ext']}" not in AUDIO_FORMATS)
+        video_format = next(x for x in info["requested_downloads"][0]["requested_formats"] if x["ext"] not in AUDIO_EXTS)
+        width = video_format["width"]
+        height = video_format["height"]
     else:
         thumb = generate_cover(audio_path)
         width = 0
@@ -214,20 +365,20 @@ def ytdlp_struct_info(info: dict) -> dict:
         else:
             info["uploader"] = "Unknown"
 
-    compact_uploader = info["uploader"].strip().replace(" ", "_").replace(".", "_").replace("-", "_").replace("/", "_")
+    compact_uploader = info["uploader"].strip().translate(UPLOADER_TRANS)
     # clean up url tracking parameters
     info = remove_url_tracking(info)
 
     return {
         "title": info["title"],
-        "video_path": Path(video_path).resolve().as_posix(),
-        "audio_path": Path(audio_path).resolve().as_posix(),
+        "video_path": absolute_path(video_path),
+        "audio_path": absolute_path(audio_path),
         "caption": f"[{info['title']}]({info['webpage_url']})\n#{compact_uploader} #{info['upload_date']}",
         "uploader": info["uploader"],
         "duration": round(float(info["duration"])),
         "width": int(width),
         "height": int(height),
-        "thumb": Path(thumb).resolve().as_posix(),
+        "thumb": absolute_path(thumb),
     }
 
 
@@ -241,12 +392,13 @@ def get_filepath(info: dict, media_format: str = "video") -> str:
     Returns:
         str: file path
     """
-    final_path = info["requested_downloads"][0]["filepath"]
-    logger.trace(f"Get {media_format} filepath based on downloaded file: {final_path}")
+    requested_download = info["requested_downloads"][0]
+    final_path = requested_download["filepath"]
+    logger.trace("Get {} filepath based on downloaded file: {}", media_format, final_path)
 
     # video
     if media_format == "video":
-        if f".{info['requested_downloads'][0]['ext']}" not in AUDIO_FORMATS:
+        if requested_download["ext"] not in AUDIO_EXTS:
             logger.info(f"Use {media_format} filepath: {final_path}")
             return final_path
         logger.warning(f"Not a valid video format: {final_path}")
@@ -259,17 +411,23 @@ def get_filepath(info: dict, media_format: str = "video") -> str:
         return final_path
 
     # if download with video format, find the corresponding audio format
-    requested_formats = info["requested_downloads"][0]["requested_formats"]
-    audios = [x for x in requested_formats if x["audio_ext"] != "none" and f".{x['audio_ext']}" in AUDIO_FORMATS]
+    requested_formats = requested_download["requested_formats"]
+    audios = [x for x in requested_formats if x["audio_ext"] in AUDIO_EXTS]
     if len(audios) != 1:
         logger.warning("No audio file found")
         return ""
     audio_ext = audios[0]["audio_ext"]
     format_id = audios[0]["format_id"]
     audio_path = Path(final_path).with_suffix(f".f{format_id}.{audio_ext}")
-    logger.debug(f"Found audio filepath: {audio_path}")
+    logger.debug("Found audio filepath: {}", audio_path)
     # create a symmlink to the audio file without format_id
     strip_id_path = Path(final_path).with_suffix(f".{audio_ext}")
+    try:
+        if os.readlink(strip_id_path) == str(audio_path):
+            logger.debug("Symlink already exists: {}", strip_id_path.name)
+            return strip_id_path.as_posix()
+    except OSError:  # not exists or not a symlink
+        pass
     strip_id_path.unlink(missing_ok=True)
     strip_id_path.symlink_to(audio_path)
     logger.info(f"Symlink {audio_ext} file to: {strip_id_path.name}")